@@ -0,0 +1,84 @@
+"""
+Cold-start budget check, run in CI with `python check_startup.py`.
+Each measurement runs in a fresh interpreter so nothing is already imported.
+"""
+import json
+import os
+import subprocess
+import sys
+
+# Budgets in seconds, measured from interpreter start. Each is the slowest of
+# five local runs (core 0.12s, main.py 1.33s, main_single_bank.py 0.83s)
+# doubled to leave headroom for slower CI runners; lower them when a change
+# makes startup faster.
+CORE_IMPORT_BUDGET = 0.25
+APP_FIRST_RUN_BUDGETS = {
+    "main.py": 2.7,
+    "main_single_bank.py": 1.7
+}
+
+# Modules the calculation core must not pull in
+UI_MODULES = ("streamlit", "pandas", "plotly")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CORE_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import data_models, utils, contagion, manifest
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (UI_MODULES,)
+
+APP_FIRST_RUN_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(%r, default_timeout=60).run()
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "elapsed": elapsed,
+    "errors": [str(e.value) for e in app.exception],
+    "loaded": [m for m in %r if m in sys.modules]
+}))
+"""
+
+
+def measure(script):
+    """
+    Run a snippet in a fresh interpreter and return its JSON report
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    failures = []
+
+    core = measure(CORE_IMPORT_SCRIPT)
+    print(f"core import: {core['elapsed']:.3f}s (budget {CORE_IMPORT_BUDGET}s)")
+    if core["loaded"]:
+        failures.append(f"calculation core imported UI modules: {', '.join(core['loaded'])}")
+    if core["elapsed"] > CORE_IMPORT_BUDGET:
+        failures.append("core import exceeded its budget")
+
+    for app_file, budget in APP_FIRST_RUN_BUDGETS.items():
+        app = measure(APP_FIRST_RUN_SCRIPT % (os.path.join(ROOT, app_file), UI_MODULES[1:]))
+        loaded = ", ".join(app["loaded"]) or "none"
+        print(f"{app_file} first run: {app['elapsed']:.3f}s (budget {budget}s), loaded {loaded}")
+        if app["errors"]:
+            failures.append(f"{app_file} raised: {'; '.join(app['errors'])}")
+        if app["elapsed"] > budget:
+            failures.append(f"{app_file} first run exceeded its budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
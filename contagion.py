@@ -0,0 +1,128 @@
+import numpy as np
+
+from data_models import ASSET_ABSORPTION, CREDITORS
+from utils import (
+    calculate_scenario_losses, calculate_scenario_values, summarize_loss_allocation, ASSET_ABSORPTION_RATE
+)
+
+
+def calculate_sector_tier_losses(remaining_losses, capacities):
+    """
+    Vectorised waterfall across banks: row i spreads remaining_losses[i] over
+    the tier capacities in capacities[i], in column order
+    """
+    absorbed_before = np.cumsum(capacities, axis=1) - capacities
+    return np.clip(remaining_losses[:, None] - absorbed_before, 0.0, capacities)
+
+def build_exposure_matrix(banks, creditor_order, exposures, exempt_creditors=None):
+    """
+    Build the sparse interbank exposure matrix in coordinate form.
+    exposures is an iterable of (holder_bank, issuer_bank, tier, amount), with
+    tier a creditor id: the holder owns amount of the issuer's tier (typically
+    senior unsecured or subordinated debt) and shares pro rata in its losses.
+    Exempt tiers still hold their exposures but pass no losses through.
+    Returns a dict with the bank names, tier capacities and, per exposure, the
+    holder row, the flattened (issuer, tier) column and the share held.
+    """
+    if exempt_creditors is None:
+        exempt_creditors = set()
+
+    names = list(banks)
+    order = [c for c in creditor_order if c != ASSET_ABSORPTION]
+    bank_index = {bank: i for i, bank in enumerate(names)}
+    tier_index = {tier: i for i, tier in enumerate(order)}
+    tier_capacities = np.array([banks[bank].capacities for bank in names]).reshape(len(names), len(CREDITORS))
+    tier_capacities = tier_capacities[:, order]
+    capacities = tier_capacities * [tier not in exempt_creditors for tier in order]
+
+    holders, columns, amounts = [], [], []
+    for holder, issuer, tier, amount in exposures:
+        if holder == issuer:
+            raise ValueError(f"{holder} cannot hold its own {tier}")
+        for bank in (holder, issuer):
+            if bank not in bank_index:
+                raise ValueError(f"Unknown bank {bank!r} in interbank exposures")
+        if tier not in tier_index:
+            raise ValueError(f"Creditor {tier} cannot hold interbank exposures: "
+                             "it is Asset Absorption or missing from the creditor order")
+        holders.append(bank_index[holder])
+        columns.append(bank_index[issuer] * len(order) + tier_index[tier])
+        amounts.append(amount)
+
+    holders = np.array(holders, dtype=np.int64)
+    columns = np.array(columns, dtype=np.int64)
+    amounts = np.array(amounts, dtype=float)
+
+    held = np.bincount(columns, weights=amounts, minlength=tier_capacities.size)
+    if np.any(held > tier_capacities.ravel() + 1.0):
+        raise ValueError("Interbank holdings exceed the capacity of the tier they are held in")
+
+    # Shares are taken of the full tier; an exempt tier takes no loss to share
+    held_capacities = tier_capacities.ravel()[columns]
+    shares = np.divide(amounts, held_capacities, out=np.zeros_like(amounts), where=held_capacities > 0)
+
+    return {
+        "banks": names,
+        "creditor_order": order,
+        "capacities": capacities,
+        "holders": holders,
+        "columns": columns,
+        "shares": shares
+    }
+
+def propagate_contagion(banks, creditor_order, exposures, scenario, loss_percentage,
+                        exempt_creditors=None, tolerance=1.0, max_rounds=100):
+    """
+    Propagate losses through the interbank network until they converge.
+    Each bank's own scenario loss runs through the waterfall; losses landing
+    on tiers held by other banks become extra losses for those holders, whose
+    waterfalls are rerun. Only banks whose incoming loss moved by more than
+    tolerance are re-evaluated in a round.
+    Returns a dict with the bank names, creditor order, own and incoming loss
+    per bank, tier losses of shape (n_banks, n_tiers), the unallocated
+    shortfall per bank, rounds run and whether the propagation converged.
+    """
+    matrix = build_exposure_matrix(banks, creditor_order, exposures, exempt_creditors)
+    names = matrix["banks"]
+    capacities = matrix["capacities"]
+
+    total_assets = np.array([banks[bank].total_assets for bank in names])
+    own_loss = np.array([calculate_scenario_losses(assets, loss_percentage, scenario)[0]
+                         for assets in total_assets])
+    absorption_capacity = np.array([calculate_scenario_values(assets, scenario)[0]
+                                    for assets in total_assets]) * ASSET_ABSORPTION_RATE
+
+    incoming_loss = np.zeros(len(names))
+    remaining_loss = np.maximum(own_loss - absorption_capacity, 0.0)
+    tier_losses = calculate_sector_tier_losses(remaining_loss, capacities)
+
+    converged = False
+    rounds = 0
+    while rounds < max_rounds:
+        rounds += 1
+        propagated = np.bincount(
+            matrix["holders"],
+            weights=matrix["shares"] * tier_losses.ravel()[matrix["columns"]],
+            minlength=len(names)
+        )
+        changed = np.abs(propagated - incoming_loss) > tolerance
+        if not changed.any():
+            converged = True
+            break
+
+        incoming_loss[changed] = propagated[changed]
+        remaining_loss[changed] = np.maximum(
+            own_loss[changed] + incoming_loss[changed] - absorption_capacity[changed], 0.0
+        )
+        tier_losses[changed] = calculate_sector_tier_losses(remaining_loss[changed], capacities[changed])
+
+    return {
+        "banks": names,
+        "creditor_order": matrix["creditor_order"],
+        "own_loss": own_loss,
+        "incoming_loss": incoming_loss,
+        "tier_losses": tier_losses,
+        "shortfall": summarize_loss_allocation(remaining_loss, tier_losses)["shortfall"],
+        "rounds": rounds,
+        "converged": converged
+    }
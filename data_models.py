@@ -1,4 +1,6 @@
-# Default creditor types with their properties
+from dataclasses import dataclass, replace
+
+# Default creditor types with their properties, in their default priority order
 DEFAULT_CREDITORS = {
     "Asset Absorption": {
         "color": "#17becf",
@@ -64,4 +66,103 @@ DEFAULT_BANKS = {
         "Subordinated Debt": 50000000,
         "Shareholders": 50000000
     }
-}
\ No newline at end of file
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Creditor:
+    """
+    A creditor class; id is its index in CREDITORS and in Bank.capacities
+    """
+    id: int
+    name: str
+    color: str
+    priority: int
+    fixed_percentage: float | None = None
+    system: bool = False
+
+@dataclass(frozen=True, slots=True)
+class Bank:
+    """
+    A bank's balance sheet; capacities[i] is the amount held by creditor id i
+    """
+    name: str
+    total_assets: float
+    capacities: tuple
+
+    def with_capacity(self, creditor_id, value):
+        """
+        Copy of this bank with one creditor's capacity replaced
+        """
+        capacities = list(self.capacities)
+        capacities[creditor_id] = float(value)
+        return replace(self, capacities=tuple(capacities))
+
+    def scaled(self, name, factor):
+        """
+        Copy of this bank under a new name with every amount scaled by factor
+        """
+        return Bank(name, self.total_assets * factor, tuple(c * factor for c in self.capacities))
+
+def load_creditors(raw_creditors):
+    """
+    Validate creditor definitions keyed by name and assign their integer ids
+    """
+    creditors = []
+    priorities = set()
+    for creditor_id, (name, spec) in enumerate(raw_creditors.items()):
+        unknown = set(spec) - {"color", "priority", "fixed_percentage", "system"}
+        if unknown:
+            raise ValueError(f"Creditor {name!r} has unknown properties: {', '.join(sorted(unknown))}")
+        if not isinstance(spec.get("color"), str) or not spec["color"].startswith("#"):
+            raise ValueError(f"Creditor {name!r} needs a hex color")
+        priority = spec.get("priority", creditor_id + 1)
+        if not isinstance(priority, int) or priority in priorities:
+            raise ValueError(f"Creditor {name!r} needs a unique integer priority")
+        priorities.add(priority)
+        fixed_percentage = spec.get("fixed_percentage")
+        if fixed_percentage is not None and not 0 <= fixed_percentage <= 100:
+            raise ValueError(f"Creditor {name!r} has a fixed percentage outside 0-100")
+
+        creditors.append(Creditor(
+            id=creditor_id,
+            name=name,
+            color=spec["color"],
+            priority=priority,
+            fixed_percentage=None if fixed_percentage is None else float(fixed_percentage),
+            system=bool(spec.get("system", False))
+        ))
+    return tuple(creditors)
+
+def load_banks(raw_banks, creditors):
+    """
+    Validate bank balance sheets keyed by creditor name and convert them to
+    Bank objects with capacities indexed by creditor id
+    """
+    banks = {}
+    known = {"total_assets"} | {c.name for c in creditors}
+    for name, data in raw_banks.items():
+        missing = known - set(data)
+        if missing:
+            raise ValueError(f"Bank {name!r} is missing: {', '.join(sorted(missing))}")
+        unknown = set(data) - known
+        if unknown:
+            raise ValueError(f"Bank {name!r} has unknown creditors: {', '.join(sorted(unknown))}")
+        if data["total_assets"] <= 0:
+            raise ValueError(f"Bank {name!r} needs positive total assets")
+        if any(data[c.name] < 0 for c in creditors):
+            raise ValueError(f"Bank {name!r} has negative creditor amounts")
+
+        banks[name] = Bank(
+            name=name,
+            total_assets=float(data["total_assets"]),
+            capacities=tuple(float(data[c.name]) for c in creditors)
+        )
+    return banks
+
+# Typed model built once at import; the rest of the app works with creditor ids
+CREDITORS = load_creditors(DEFAULT_CREDITORS)
+CREDITOR_IDS = {c.name: c.id for c in CREDITORS}
+ASSET_ABSORPTION = CREDITOR_IDS["Asset Absorption"]
+SINGLE_RESOLUTION_FUND = CREDITOR_IDS["Single Resolution Fund"]
+BANKS = load_banks(DEFAULT_BANKS, CREDITORS)
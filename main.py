@@ -1,7 +1,10 @@
+import json
+
+import numpy as np
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+# pandas and plotly are imported inside the views that use them; only the
+# selected view runs, so views that are not open never load them
 
 # Handling the streamlit_sortables import with a try-except block
 try:
@@ -12,67 +15,35 @@ except ImportError:
         st.warning("streamlit_sortables not available - ordering functionality disabled")
         return items
 
-# Mock the missing utilities if they can't be imported
-try:
-    from utils import calculate_loss_distribution, reorder_creditors, calculate_total_loss_with_absorption
-    from styles import apply_styles
-    from data_models import DEFAULT_CREDITORS, DEFAULT_BANKS
-except ImportError:
-    st.error("Required modules not found. Please ensure utils.py, styles.py, and data_models.py are present in the repository.")
-    
-    # Define minimal versions of required functions and data
-    def calculate_loss_distribution(loss, bank_data, creditors, order, exempt):
-        return {c: 0 for c in order}
-    
-    def reorder_creditors(order):
-        return order
-    
-    def calculate_total_loss_with_absorption(assets, percentage):
-        return assets * (percentage / 100)
-    
-    def apply_styles():
-        st.markdown("""
-        <style>
-        .formatted-value { font-size: 0.9rem; color: #555; margin-top: -1rem; }
-        .creditor-divider { margin: 0.5rem 0; border: 0; border-top: 1px solid #eee; }
-        </style>
-        """, unsafe_allow_html=True)
-    
-    # Define default data structures
-    DEFAULT_CREDITORS = {
-        "Senior Debt": {"color": "#3498db"},
-        "Subordinated Debt": {"color": "#9b59b6"},
-        "Equity": {"color": "#e74c3c"},
-        "Asset Absorption": {"color": "#2ecc71"}
-    }
-    
-    DEFAULT_BANKS = {
-        "Bank A": {
-            "total_assets": 1000000000,
-            "Senior Debt": 400000000,
-            "Subordinated Debt": 300000000,
-            "Equity": 300000000
-        }
-    }
+from utils import (
+    compare_hierarchies, optimize_sector_exemptions, decode_exemption_mask, calculate_loss_surface,
+    SCENARIO_LIABILITY_SHARES
+)
+from styles import apply_styles
+from data_models import CREDITORS, BANKS, ASSET_ABSORPTION
+from manifest import run_manifest, RESULTS_DIR
 
 def format_currency(value):
-    """Format number in millions with thousand separators using dots"""
+    """Format number in millions with thousand separators using dots; negative values get a leading minus"""
+    sign = "-" if round(value) < 0 else ""
+    value = abs(value)
     in_millions = value / 1000000
     if in_millions >= 1:
         formatted = "{:,.1f}M".format(in_millions).replace(",", ".")
     else:
         formatted = "{:,.0f}".format(value).replace(",", ".")
-    return f"€{formatted}"
+    return f"{sign}€{formatted}"
 
 def render_bank_values():
+    import pandas as pd
+
     st.header("Bank Values")
     data = []
-    bank_data = st.session_state.current_bank_data["Bank A"]  # Use single bank
+    bank = st.session_state.current_bank_data["Bank A"]  # Use single bank
     row = {}
     row["Bank"] = "Bank A"
-    for k, v in bank_data.items():
-        if k != "total_assets":
-            row[k] = v
+    for creditor in CREDITORS:
+        row[st.session_state.creditor_names[creditor.id]] = bank.capacities[creditor.id]
     data.append(row)
 
     df = pd.DataFrame(data)
@@ -83,150 +54,398 @@ def render_bank_values():
 
     st.dataframe(display_df, use_container_width=True)
 
-def calculate_scenario_values(total_assets, scenario):
-    """Calculate asset and liability values based on selected scenario"""
-    if scenario == "FOLTF":
-        liability_percentage = 0.20  # 20% of assets moved to liabilities
-    elif scenario == "Resolution Valuation":
-        liability_percentage = 0.30  # 30% of assets moved to liabilities
-    elif scenario == "Liquidation Valuation":
-        liability_percentage = 0.40  # 40% of assets moved to liabilities
-    else:
-        liability_percentage = 0.0  # Default case
+def describe_hierarchy(creditor_order, exempt_creditors):
+    """Render a hierarchy as a single line using the current display names"""
+    names = st.session_state.creditor_names
+    description = " → ".join(names[c] for c in creditor_order)
+    if exempt_creditors:
+        description += " (exempt: " + ", ".join(names[c] for c in creditor_order if c in exempt_creditors) + ")"
+    return description
+
+def render_hierarchy_comparison(loss_percentage):
+    import plotly.graph_objects as go
+    from plotly.colors import qualitative
+    from plotly.subplots import make_subplots
+
+    st.header("Hierarchy Comparison")
+    st.markdown("Pin the current hierarchy as a baseline, then reorder creditors or toggle exemptions in the sidebar and add each variant as an alternative.")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        if st.button("Pin Current as Baseline"):
+            st.session_state.baseline_hierarchy = (
+                list(st.session_state.creditor_order),
+                set(st.session_state.exempt_creditors)
+            )
+            st.session_state.alternative_hierarchies = []
+    with col2:
+        if st.button("Add Current as Alternative", disabled=st.session_state.baseline_hierarchy is None):
+            st.session_state.alternative_hierarchies.append((
+                list(st.session_state.creditor_order),
+                set(st.session_state.exempt_creditors)
+            ))
+    with col3:
+        if st.button("Clear Alternatives"):
+            st.session_state.alternative_hierarchies = []
+
+    if st.session_state.baseline_hierarchy is None:
+        st.info("No baseline pinned yet")
+        return
+
+    baseline_order, baseline_exempt = st.session_state.baseline_hierarchy
+    st.write(f"**Baseline:** {describe_hierarchy(baseline_order, baseline_exempt)}")
+    for idx, (creditor_order, exempt_creditors) in enumerate(st.session_state.alternative_hierarchies):
+        st.write(f"**Alternative {idx + 1}:** {describe_hierarchy(creditor_order, exempt_creditors)}")
+
+    if not st.session_state.alternative_hierarchies:
+        st.info("Add at least one alternative to compare against the baseline")
+        return
+
+    scenarios = list(SCENARIO_LIABILITY_SHARES.keys())
+    deltas = compare_hierarchies(
+        st.session_state.current_bank_data,
+        st.session_state.baseline_hierarchy,
+        st.session_state.alternative_hierarchies,
+        scenarios,
+        loss_percentage
+    )
+
+    bank = st.selectbox(
+        "Select Bank",
+        options=list(st.session_state.current_bank_data.keys()),
+        key="comparison_bank"
+    )
+
+    fig = make_subplots(
+        rows=1, cols=len(scenarios),
+        subplot_titles=scenarios,
+        shared_yaxes=True,
+        horizontal_spacing=0.03
+    )
+    creditor_labels = [st.session_state.creditor_names[c] for c in baseline_order]
+    palette = qualitative.Plotly
+    for idx, alternative_deltas in enumerate(deltas):
+        for col, scenario in enumerate(scenarios):
+            scenario_deltas = alternative_deltas[bank][col]
+            fig.add_trace(
+                go.Bar(
+                    name=f"Alternative {idx + 1}",
+                    x=creditor_labels,
+                    y=scenario_deltas,
+                    marker_color=palette[idx % len(palette)],
+                    legendgroup=f"alternative_{idx}",
+                    showlegend=col == 0,
+                    hovertext=[format_currency(v) for v in scenario_deltas],
+                ),
+                row=1, col=col + 1
+            )
 
-    # Calculate values while maintaining total
-    liability_value = total_assets * liability_percentage
-    asset_value = total_assets - liability_value
-    return asset_value, liability_value
+    fig.update_layout(
+        height=600,
+        barmode='group',
+        title=f"Loss Delta vs Baseline ({bank})",
+        legend_title="Hierarchy",
+    )
+    fig.update_yaxes(title_text="Loss Delta (EUR)", tickformat=",.0f", col=1)
+
+    st.plotly_chart(fig, use_container_width=True)
+
+def apply_exemptions(exempt_creditors):
+    """Replace the exemption set, keeping the sidebar checkboxes in sync"""
+    st.session_state.exempt_creditors = set(exempt_creditors)
+    for creditor in st.session_state.creditor_order:
+        st.session_state[f"exempt_{creditor}"] = creditor in exempt_creditors
+
+def render_exemption_optimizer(scenario, loss_percentage):
+    st.header("Exemption Optimizer")
+    st.markdown("Searches every exemption set for the current hierarchy and scenario. A set is feasible when the whole loss is allocated, the minimum bail-in of creditors is reached before the resolution fund is used and the fund's loss stays within its cap. Losses absorbed by assets do not count as bail-in.")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        min_bail_in = st.number_input(
+            "Minimum Bail-in Before Fund Use (% of total assets)",
+            min_value=0.0,
+            max_value=100.0,
+            value=8.0,
+            step=0.5
+        )
+    with col2:
+        max_fund_loss = st.number_input(
+            "Resolution Fund Loss Cap (% of total assets)",
+            min_value=0.0,
+            max_value=100.0,
+            value=5.0,
+            step=0.5
+        )
+
+    results = optimize_sector_exemptions(
+        st.session_state.current_bank_data,
+        st.session_state.creditor_order,
+        scenario,
+        loss_percentage,
+        min_bail_in_rate=min_bail_in / 100,
+        max_fund_rate=max_fund_loss / 100
+    )
+
+    names = st.session_state.creditor_names
+    for bank, result in results.items():
+        st.subheader(bank)
+        feasible_count = len(result["feasible_masks"])
+        st.write(f"{feasible_count} of {1 << len(result['candidates'])} exemption sets are feasible")
+
+        if result["optimal"] is None:
+            st.warning("No exemption set satisfies the constraints")
+            continue
+
+        optimal = result["optimal"]
+        optimal_names = ", ".join(names[c] for c in result["candidates"] if c in optimal) or "None"
+        st.write(f"**Optimal exemptions:** {optimal_names}")
+        st.button(
+            "Apply Optimal Exemptions",
+            key=f"apply_optimal_{bank}",
+            on_click=apply_exemptions,
+            args=(optimal,)
+        )
+
+        # Best feasible sets, ranked like the optimum
+        ranking = np.lexsort((result["fund_loss"], -result["exempt_amount"]))[:10]
+        st.dataframe({
+            "Exempt Creditors": [
+                ", ".join(names[c] for c in result["candidates"]
+                          if c in decode_exemption_mask(int(result["feasible_masks"][i]), result["candidates"])) or "None"
+                for i in ranking
+            ],
+            "Exempt Amount": [format_currency(result["exempt_amount"][i]) for i in ranking],
+            "Bail-in": [format_currency(result["bail_in"][i]) for i in ranking],
+            "Fund Loss": [format_currency(result["fund_loss"][i]) for i in ranking],
+        }, use_container_width=True)
+
+def render_loss_surface(scenario):
+    import plotly.graph_objects as go
+
+    st.header("Loss Surface")
+    st.markdown("Loss of one creditor across loss percentages and every position it could take in the hierarchy. Narrow the loss range to zoom in; the grid uses 0.1% steps.")
+
+    bank = st.session_state.current_bank_data["Bank A"]  # Use single bank
+    names = st.session_state.creditor_names
+    creditor_order = st.session_state.creditor_order
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        creditor = st.selectbox(
+            "Select Creditor",
+            options=creditor_order,
+            format_func=lambda c: names[c],
+            key="surface_creditor"
+        )
+    with col2:
+        start, stop = st.slider(
+            "Loss Percentage Range",
+            min_value=0.0,
+            max_value=100.0,
+            value=(0.0, 100.0),
+            step=0.1,
+            key="surface_range"
+        )
+
+    if stop <= start:
+        st.info("Select a wider loss percentage range")
+        return
+
+    current_position = creditor_order.index(creditor)
+    positions = [
+        f"Position {p + 1}" + (" (current)" if p == current_position else "")
+        for p in range(len(creditor_order))
+    ]
+
+    loss_percentages, surface = calculate_loss_surface(
+        bank, creditor_order, creditor, scenario, start, stop, 0.1,
+        st.session_state.exempt_creditors
+    )
+    fig = go.Figure(go.Heatmap(
+        x=loss_percentages,
+        y=positions,
+        z=surface,
+        colorscale="Reds",
+        colorbar=dict(title="Loss (EUR)"),
+        hovertemplate="%{y}<br>Loss: %{x}% of assets<br>Creditor loss: €%{z:,.0f}<extra></extra>",
+    ))
+    fig.update_layout(
+        height=500,
+        title=f"Loss Surface for {names[creditor]}",
+        xaxis_title="Loss Percentage of Total Assets",
+        yaxis_title="Position in Hierarchy",
+        yaxis_autorange="reversed",
+    )
+    st.plotly_chart(fig, use_container_width=True)
 
 def main():
     # Initialize session state first thing
     if 'creditor_order' not in st.session_state:
-        st.session_state.creditor_order = [c for c in DEFAULT_CREDITORS.keys() if c != "Asset Absorption"]
+        st.session_state.creditor_order = [c.id for c in CREDITORS if c.id != ASSET_ABSORPTION]
     if 'current_bank_data' not in st.session_state:
-        st.session_state.current_bank_data = {"Bank A": DEFAULT_BANKS["Bank A"].copy()}
+        st.session_state.current_bank_data = {"Bank A": BANKS["Bank A"]}
     if 'exempt_creditors' not in st.session_state:
         st.session_state.exempt_creditors = set()
     if 'graph_explanations' not in st.session_state:
         st.session_state.graph_explanations = {}
     if 'creditor_names' not in st.session_state:
-        st.session_state.creditor_names = {c: c for c in DEFAULT_CREDITORS.keys()}
+        st.session_state.creditor_names = {c.id: c.name for c in CREDITORS}
+    if 'baseline_hierarchy' not in st.session_state:
+        st.session_state.baseline_hierarchy = None
+    if 'alternative_hierarchies' not in st.session_state:
+        st.session_state.alternative_hierarchies = []
     
     apply_styles()
     st.title("Banking Sector Loss Distribution Model")
 
-    tab1, tab2 = st.tabs(["Loss Distribution", "Bank Values"])
-
-    with tab1:
-        with st.sidebar:
-            st.header("Configuration")
-
-            # Scenario selection
-            scenario = st.radio(
-                "Select Scenario",
-                options=["Default", "FOLTF", "Resolution Valuation", "Liquidation Valuation"],
-                help="""
-                FOLTF: Redistributes 20% of assets to liabilities
-                Resolution Valuation: Redistributes 30% of assets to liabilities
-                Liquidation Valuation: Redistributes 40% of assets to liabilities
-                Default: No redistribution applied
-                """
+    # Only the selected view runs on a rerun, so views that are not open never
+    # load pandas or plotly or run their calculations
+    view = st.radio(
+        "View",
+        options=["Loss Distribution", "Hierarchy Comparison", "Exemption Optimizer", "Loss Surface", "Bank Values"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="view"
+    )
+
+    with st.sidebar:
+        st.header("Configuration")
+
+        # Scenario selection
+        scenario = st.radio(
+            "Select Scenario",
+            options=["Default", "FOLTF", "Resolution Valuation", "Liquidation Valuation"],
+            help="""
+            FOLTF: Redistributes 20% of assets to liabilities
+            Resolution Valuation: Redistributes 30% of assets to liabilities
+            Liquidation Valuation: Redistributes 40% of assets to liabilities
+            Default: No redistribution applied
+            """
+        )
+
+        # Loss percentage slider - disabled for non-default scenarios
+        if scenario == "Default":
+            loss_percentage = st.slider(
+                "Loss Percentage of Total Assets",
+                min_value=0.0,
+                max_value=100.0,
+                value=10.0,
+                step=1.0
             )
-
-            # Loss percentage slider - disabled for non-default scenarios
-            if scenario == "Default":
-                loss_percentage = st.slider(
-                    "Loss Percentage of Total Assets",
-                    min_value=0.0,
-                    max_value=100.0,
-                    value=10.0,
-                    step=1.0
-                )
+        else:
+            # Display disabled slider with fixed value for non-default scenarios
+            st.slider(
+                "Loss Percentage of Total Assets",
+                min_value=0.0,
+                max_value=100.0,
+                value=20.0,  # Fixed value for scenarios
+                step=1.0,
+                disabled=True,
+                help="Loss percentage is fixed in scenario mode"
+            )
+            loss_percentage = 20.0  # Use fixed value for scenarios
+
+        # Creditor hierarchy section
+        st.subheader("Creditor Hierarchy")
+        with st.container():
+            st.markdown("""
+                <div style='background-color: #f5f3ff; padding: 1rem; border-radius: 8px; margin-bottom: 1rem;'>
+                    Drag and drop creditors to reorder
+                </div>
+            """, unsafe_allow_html=True)
+
+            displayed_names = [st.session_state.creditor_names[c] for c in st.session_state.creditor_order]
+            sorted_creditors = sort_items(displayed_names)
+
+            # Update order if changed, mapping the sorted labels back to creditor ids
+            if sorted_creditors != displayed_names:
+                st.session_state.creditor_order = [
+                    st.session_state.creditor_order[displayed_names.index(name)] for name in sorted_creditors
+                ]
+                st.rerun()
+
+        # Display creditor values and exempt checkboxes
+        bank = "Bank A"  # Use single bank
+        st.subheader("Creditor Values")
+
+        for creditor in st.session_state.creditor_order:
+            # Editable creditor name
+            new_name = st.text_input(
+                "Name",
+                value=st.session_state.creditor_names[creditor],
+                key=f"name_{creditor}",
+                label_visibility="collapsed"
+            )
+            # Names label the sortable list and table columns, so they must be
+            # non-empty and unique; a rejected edit keeps the previous name
+            new_name = new_name.strip()
+            other_names = {name for c, name in st.session_state.creditor_names.items() if c != creditor}
+            if not new_name:
+                st.warning("Creditor names cannot be empty")
+            elif new_name in other_names:
+                st.warning(f"Another creditor is already named {new_name}")
             else:
-                # Display disabled slider with fixed value for non-default scenarios
-                st.slider(
-                    "Loss Percentage of Total Assets",
-                    min_value=0.0,
-                    max_value=100.0,
-                    value=20.0,  # Fixed value for scenarios
-                    step=1.0,
-                    disabled=True,
-                    help="Loss percentage is fixed in scenario mode"
-                )
-                loss_percentage = 20.0  # Use fixed value for scenarios
-
-            # Creditor hierarchy section
-            st.subheader("Creditor Hierarchy")
-            with st.container():
-                st.markdown("""
-                    <div style='background-color: #f5f3ff; padding: 1rem; border-radius: 8px; margin-bottom: 1rem;'>
-                        Drag and drop creditors to reorder
-                    </div>
-                """, unsafe_allow_html=True)
-
-                sorted_creditors = sort_items(
-                    [st.session_state.creditor_names[c] for c in st.session_state.creditor_order]
-                )
-
-                # Update order if changed
-                if sorted_creditors != [st.session_state.creditor_names[c] for c in st.session_state.creditor_order]:
-                    name_to_key = {v: k for k, v in st.session_state.creditor_names.items()}
-                    st.session_state.creditor_order = [name_to_key[name] for name in sorted_creditors]
-                    st.rerun()
-
-            # Display creditor values and exempt checkboxes
-            bank = "Bank A"  # Use single bank
-            st.subheader("Creditor Values")
-
-            for creditor in st.session_state.creditor_order:
-                # Editable creditor name
-                new_name = st.text_input(
-                    "Name",
-                    value=st.session_state.creditor_names[creditor],
-                    key=f"name_{creditor}",
-                    label_visibility="collapsed"
-                )
                 st.session_state.creditor_names[creditor] = new_name
 
-                # Value input
-                value = st.number_input(
-                    "Value (EUR)",
-                    value=float(st.session_state.current_bank_data[bank][creditor]),
-                    key=f"value_{creditor}_{bank}",
-                    step=1000000.0,
-                    format="%f",
-                    label_visibility="collapsed"
-                )
-                st.markdown(f'<p class="formatted-value">{format_currency(value)}</p>', unsafe_allow_html=True)
-                st.session_state.current_bank_data[bank][creditor] = value
-
-                # Exempt checkbox
-                is_exempt = st.checkbox(
-                    "Exempt",
-                    value=creditor in st.session_state.exempt_creditors,
-                    key=f"exempt_{creditor}",
-                    help="Exclude this creditor from loss absorption"
-                )
-                if is_exempt and creditor not in st.session_state.exempt_creditors:
-                    st.session_state.exempt_creditors.add(creditor)
-                elif not is_exempt and creditor in st.session_state.exempt_creditors:
-                    st.session_state.exempt_creditors.remove(creditor)
+            # Value input
+            value = st.number_input(
+                "Value (EUR)",
+                value=st.session_state.current_bank_data[bank].capacities[creditor],
+                key=f"value_{creditor}_{bank}",
+                step=1000000.0,
+                format="%f",
+                label_visibility="collapsed"
+            )
+            st.markdown(f'<p class="formatted-value">{format_currency(value)}</p>', unsafe_allow_html=True)
+            st.session_state.current_bank_data[bank] = st.session_state.current_bank_data[bank].with_capacity(
+                creditor, value
+            )
+
+            # Exempt checkbox
+            is_exempt = st.checkbox(
+                "Exempt",
+                value=creditor in st.session_state.exempt_creditors,
+                key=f"exempt_{creditor}",
+                help="Exclude this creditor from loss absorption"
+            )
+            if is_exempt and creditor not in st.session_state.exempt_creditors:
+                st.session_state.exempt_creditors.add(creditor)
+            elif not is_exempt and creditor in st.session_state.exempt_creditors:
+                st.session_state.exempt_creditors.remove(creditor)
 
-                if creditor != st.session_state.creditor_order[-1]:
-                    st.markdown('<hr class="creditor-divider">', unsafe_allow_html=True)
+            if creditor != st.session_state.creditor_order[-1]:
+                st.markdown('<hr class="creditor-divider">', unsafe_allow_html=True)
 
+    if view == "Loss Distribution":
         # Main content area for Loss Distribution
         bank = "Bank A"  # Use single bank
         st.subheader(f"Loss Distribution Analysis")
 
+        # The chart and metrics are drawn from the manifest's result, so the
+        # result hash attests to what is shown and a rerun is a cache read
+        manifest, result = run_manifest(
+            st.session_state.current_bank_data[bank],
+            st.session_state.creditor_order,
+            st.session_state.exempt_creditors,
+            scenario,
+            loss_percentage,
+            results_dir=RESULTS_DIR if st.session_state.get("store_results", False) else None
+        )
+        total_assets = st.session_state.current_bank_data[bank].total_assets
+        total_loss = result["total_loss"]
+        loss_absorbed = result["loss_absorbed"]
+        remaining_loss = result["remaining_loss"]
+        asset_value = result["asset_value"]
+        liability_value = result["liability_value"]
+        creditor_distribution = dict(zip(st.session_state.creditor_order, result["distribution"]))
+        shortfall = result["shortfall"]
+
         col1, col2 = st.columns([2, 1])
 
         with col1:
-            total_assets = st.session_state.current_bank_data[bank]["total_assets"]
-            total_loss = calculate_total_loss_with_absorption(total_assets, loss_percentage)
-
-            # Calculate scenario-based values
-            asset_value, liability_value = calculate_scenario_values(total_assets, scenario)
+            import plotly.graph_objects as go
+            from plotly.subplots import make_subplots
 
             fig = make_subplots(
                 rows=1, cols=2,
@@ -237,8 +456,6 @@ def main():
 
             # Update asset visualization based on scenario
             remaining_asset_value = max(0, asset_value - total_loss)
-            loss_absorbed = min(total_loss, asset_value * 0.08)  # 8% of scenario assets
-            remaining_loss = max(0, total_loss - loss_absorbed)
 
             fig.add_trace(
                 go.Bar(
@@ -265,14 +482,6 @@ def main():
                     row=1, col=1
                 )
 
-            creditor_distribution = calculate_loss_distribution(
-                remaining_loss,
-                st.session_state.current_bank_data[bank],
-                DEFAULT_CREDITORS,
-                st.session_state.creditor_order,
-                st.session_state.exempt_creditors
-            )
-
             for creditor in st.session_state.creditor_order:
                 if creditor in st.session_state.exempt_creditors:
                     continue
@@ -284,13 +493,27 @@ def main():
                             name=st.session_state.creditor_names[creditor],
                             x=[""],
                             y=[loss_amount],
-                            marker_color=DEFAULT_CREDITORS[creditor]['color'],
+                            marker_color=CREDITORS[creditor].color,
                             text=format_currency(loss_amount),
                             textposition='inside',
                         ),
                         row=1, col=2
                     )
 
+            if shortfall > 0:
+                fig.add_trace(
+                    go.Bar(
+                        name="Unallocated Shortfall",
+                        x=[""],
+                        y=[shortfall],
+                        marker_color="#7f7f7f",
+                        marker_pattern_shape="/",
+                        text=format_currency(shortfall),
+                        textposition='inside',
+                    ),
+                    row=1, col=2
+                )
+
             fig.update_layout(
                 height=600,
                 showlegend=True,
@@ -346,7 +569,7 @@ def main():
                 """)
 
         # Summary metrics
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
 
         with col1:
             st.metric("Total Loss", format_currency(total_loss))
@@ -357,6 +580,13 @@ def main():
         with col3:
             st.metric("Remaining Loss", format_currency(remaining_loss))
 
+        with col4:
+            st.metric(
+                "Unallocated Shortfall",
+                format_currency(shortfall),
+                help=f"Creditors cover {result['coverage_ratio'] * 100:.1f}% of the remaining loss"
+            )
+
         # Distribution percentages
         st.write("#### Distribution Percentages")
         col1, col2 = st.columns(2)
@@ -378,7 +608,40 @@ def main():
                 display_name = st.session_state.creditor_names[creditor]
                 st.write(f"{display_name}: {percentage:.1f}%")
 
-    with tab2:
+            if shortfall > 0:
+                percentage = (shortfall / total_loss) * 100
+                st.progress(percentage / 100)
+                st.write(f"Unallocated Shortfall: {percentage:.1f}%")
+
+        # Reproducibility record for the chart above
+        with st.expander("Run Manifest"):
+            store_results = st.checkbox(
+                "Store results on disk",
+                key="store_results",
+                help="Keep every distinct result in the .results directory so it can be verified later. "
+                     "The directory is never pruned; delete it to clear it."
+            )
+            if store_results and not manifest["stored"]:
+                st.warning("The result could not be written to disk and is only kept in memory")
+            st.write(f"Result hash: `{manifest['result_hash']}`")
+            st.json(manifest, expanded=False)
+            st.download_button(
+                label="Download Manifest",
+                data=json.dumps(manifest, indent=2, ensure_ascii=False),
+                file_name=f"manifest_{manifest['key'][:12]}.json",
+                mime="application/json"
+            )
+
+    elif view == "Hierarchy Comparison":
+        render_hierarchy_comparison(loss_percentage)
+
+    elif view == "Exemption Optimizer":
+        render_exemption_optimizer(scenario, loss_percentage)
+
+    elif view == "Loss Surface":
+        render_loss_surface(scenario)
+
+    elif view == "Bank Values":
         render_bank_values()
 
 if __name__ == "__main__":
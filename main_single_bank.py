@@ -1,11 +1,11 @@
 import streamlit as st
-import plotly.graph_objects as go
-import pandas as pd
-from utils import calculate_loss_distribution, reorder_creditors
+from utils import calculate_loss_allocation, reorder_creditors
 from styles import apply_styles
-from data_models import DEFAULT_CREDITORS, DEFAULT_BANKS
+from data_models import CREDITORS, BANKS
 
 def render_bank_values():
+    import pandas as pd
+
     st.header("Bank Management")
 
     # Add new bank
@@ -15,11 +15,7 @@ def render_bank_values():
     with col2:
         if st.button("Add Bank") and new_bank_name and new_bank_name not in st.session_state.current_bank_data:
             # Initialize with default values scaled to 50% of Bank A
-            st.session_state.current_bank_data[new_bank_name] = {
-                "total_assets": DEFAULT_BANKS["Bank A"]["total_assets"] * 0.5,
-                **{creditor: DEFAULT_BANKS["Bank A"][creditor] * 0.5 
-                   for creditor in DEFAULT_CREDITORS.keys()}
-            }
+            st.session_state.current_bank_data[new_bank_name] = BANKS["Bank A"].scaled(new_bank_name, 0.5)
             st.success(f"Added {new_bank_name}")
             st.rerun()
 
@@ -42,12 +38,11 @@ def render_bank_values():
 
     # Create DataFrame for bank values display
     data = []
-    for bank_name, bank_data in st.session_state.current_bank_data.items():
+    for bank_name, bank in st.session_state.current_bank_data.items():
         row = {}
         row["Bank"] = bank_name
-        for k, v in bank_data.items():
-            if k != "total_assets":
-                row[k] = v  # Keep as numeric value
+        for creditor in CREDITORS:
+            row[creditor.name] = bank.capacities[creditor.id]  # Keep as numeric value
         data.append(row)
 
     df = pd.DataFrame(data)
@@ -68,94 +63,110 @@ def main():
 
     # Initialize session states
     if 'creditor_order' not in st.session_state:
-        st.session_state.creditor_order = list(DEFAULT_CREDITORS.keys())
+        st.session_state.creditor_order = [c.id for c in CREDITORS]
     if 'current_bank_data' not in st.session_state:
-        st.session_state.current_bank_data = DEFAULT_BANKS.copy()
-
-    # Create tabs
-    tab1, tab2 = st.tabs(["Loss Distribution", "Bank Values"])
+        st.session_state.current_bank_data = BANKS.copy()
+
+    # Only the selected view runs on a rerun
+    view = st.radio(
+        "View",
+        options=["Loss Distribution", "Bank Values"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="view"
+    )
+
+    # Sidebar for controls
+    with st.sidebar:
+        st.header("Configuration")
+
+        # Bank selection
+        selected_bank = st.selectbox(
+            "Select Bank",
+            options=st.session_state.current_bank_data.keys(),
+            key="bank_selector"
+        )
 
-    with tab1:
-        # Sidebar for controls
-        with st.sidebar:
-            st.header("Configuration")
+        # Total loss input
+        total_loss = st.number_input(
+            "Total Loss (EUR)",
+            min_value=0.0,
+            value=st.session_state.current_bank_data[selected_bank].total_assets * 0.1,
+            step=1000000.0,
+            format="%f"
+        )
 
-            # Bank selection
-            selected_bank = st.selectbox(
-                "Select Bank",
-                options=st.session_state.current_bank_data.keys(),
-                key="bank_selector"
-            )
+        # Creditor hierarchy management
+        st.subheader("Creditor Hierarchy")
+        st.info("Use the buttons to reorder creditors and adjust values")
+
+        # Display creditors with up/down buttons and value inputs
+        for idx, creditor in enumerate(st.session_state.creditor_order):
+            st.write(f"### {idx + 1}. {CREDITORS[creditor].name}")
+
+            col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
+
+            # Value input
+            with col1:
+                value = st.number_input(
+                    "Value (EUR)",
+                    value=st.session_state.current_bank_data[selected_bank].capacities[creditor],
+                    key=f"value_{creditor}_{selected_bank}",
+                    step=1000000.0,
+                    format="%f",
+                    label_visibility="collapsed"
+                )
+                st.session_state.current_bank_data[selected_bank] = (
+                    st.session_state.current_bank_data[selected_bank].with_capacity(creditor, value)
+                )
+
+            # Up button
+            with col2:
+                if idx > 0:  # Can move up
+                    if st.button("↑", key=f"up_{creditor}"):
+                        st.session_state.creditor_order = reorder_creditors(
+                            st.session_state.creditor_order,
+                            creditor,
+                            idx - 1
+                        )
+                        st.rerun()
 
-            # Total loss input
-            total_loss = st.number_input(
-                "Total Loss (EUR)",
-                min_value=0.0,
-                value=st.session_state.current_bank_data[selected_bank]["total_assets"] * 0.1,
-                step=1000000.0,
-                format="%f"
-            )
+            # Down button
+            with col3:
+                if idx < len(st.session_state.creditor_order) - 1:  # Can move down
+                    if st.button("↓", key=f"down_{creditor}"):
+                        st.session_state.creditor_order = reorder_creditors(
+                            st.session_state.creditor_order,
+                            creditor,
+                            idx + 1
+                        )
+                        st.rerun()
 
-            # Creditor hierarchy management
-            st.subheader("Creditor Hierarchy")
-            st.info("Use the buttons to reorder creditors and adjust values")
-
-            # Display creditors with up/down buttons and value inputs
-            for idx, creditor in enumerate(st.session_state.creditor_order):
-                st.write(f"### {idx + 1}. {creditor}")
-
-                col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
-
-                # Value input
-                with col1:
-                    st.session_state.current_bank_data[selected_bank][creditor] = st.number_input(
-                        "Value (EUR)",
-                        value=float(st.session_state.current_bank_data[selected_bank][creditor]),
-                        key=f"value_{creditor}_{selected_bank}",
-                        step=1000000.0,
-                        format="%f",
-                        label_visibility="collapsed"
+            # Reset value button
+            with col4:
+                if st.button("Reset", key=f"reset_{creditor}"):
+                    st.session_state.current_bank_data[selected_bank] = (
+                        st.session_state.current_bank_data[selected_bank].with_capacity(
+                            creditor, BANKS[selected_bank].capacities[creditor]
+                        )
                     )
+                    st.rerun()
 
-                # Up button
-                with col2:
-                    if idx > 0:  # Can move up
-                        if st.button("↑", key=f"up_{creditor}"):
-                            st.session_state.creditor_order = reorder_creditors(
-                                st.session_state.creditor_order,
-                                creditor,
-                                idx - 1
-                            )
-                            st.rerun()
-
-                # Down button
-                with col3:
-                    if idx < len(st.session_state.creditor_order) - 1:  # Can move down
-                        if st.button("↓", key=f"down_{creditor}"):
-                            st.session_state.creditor_order = reorder_creditors(
-                                st.session_state.creditor_order,
-                                creditor,
-                                idx + 1
-                            )
-                            st.rerun()
-
-                # Reset value button
-                with col4:
-                    if st.button("Reset", key=f"reset_{creditor}"):
-                        st.session_state.current_bank_data[selected_bank][creditor] = DEFAULT_BANKS[selected_bank][creditor]
-                        st.rerun()
-
+    if view == "Loss Distribution":
         # Main content area for Loss Distribution
         col1, col2 = st.columns([2, 1])
 
         with col1:
+            import plotly.graph_objects as go
+
             # Calculate loss distribution
-            loss_data = calculate_loss_distribution(
-                total_loss,
+            allocation = calculate_loss_allocation(
+                [total_loss],
                 st.session_state.current_bank_data[selected_bank],
-                DEFAULT_CREDITORS,
                 st.session_state.creditor_order
             )
+            loss_data = dict(zip(st.session_state.creditor_order, allocation["distribution"][0]))
+            shortfall = allocation["shortfall"][0]
 
             # Create stacked bar chart
             fig = go.Figure()
@@ -165,15 +176,26 @@ def main():
             for creditor in st.session_state.creditor_order:
                 loss_amount = loss_data[creditor]
                 fig.add_trace(go.Bar(
-                    name=creditor,
+                    name=CREDITORS[creditor].name,
                     y=[loss_amount],
                     x=['Loss Distribution'],
-                    marker_color=DEFAULT_CREDITORS[creditor]['color'],
+                    marker_color=CREDITORS[creditor].color,
                     text=f'€{loss_amount:,.0f}',
                     textposition='inside',
                 ))
                 y_position += loss_amount
 
+            if shortfall > 0:
+                fig.add_trace(go.Bar(
+                    name="Unallocated Shortfall",
+                    y=[shortfall],
+                    x=['Loss Distribution'],
+                    marker_color="#7f7f7f",
+                    marker_pattern_shape="/",
+                    text=f'€{shortfall:,.0f}',
+                    textposition='inside',
+                ))
+
             # Update layout
             fig.update_layout(
                 barmode='stack',
@@ -199,12 +221,19 @@ def main():
             for creditor in st.session_state.creditor_order:
                 percentage = (loss_data[creditor] / total_loss) * 100
                 st.progress(percentage / 100)
-                st.write(f"{creditor}: {percentage:.1f}%")
+                st.write(f"{CREDITORS[creditor].name}: {percentage:.1f}%")
+
+            if shortfall > 0:
+                percentage = (shortfall / total_loss) * 100
+                st.progress(percentage / 100)
+                st.write(f"Unallocated Shortfall: {percentage:.1f}%")
 
         # Export functionality
         if st.button("Export Data"):
+            import pandas as pd
+
             df = pd.DataFrame({
-                'Creditor': st.session_state.creditor_order,
+                'Creditor': [CREDITORS[creditor].name for creditor in st.session_state.creditor_order],
                 'Loss Amount': [loss_data[creditor] for creditor in st.session_state.creditor_order],
                 'Percentage': [(loss_data[creditor] / total_loss) * 100 for creditor in st.session_state.creditor_order]
             })
@@ -217,7 +246,7 @@ def main():
                 mime="text/csv"
             )
 
-    with tab2:
+    elif view == "Bank Values":
         render_bank_values()
 
 if __name__ == "__main__":
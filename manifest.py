@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data_models import CREDITORS, Bank
+from utils import (
+    calculate_loss_allocation, calculate_scenario_losses, calculate_scenario_values,
+    ASSET_ABSORPTION_RATE, ENGINE_VERSION, SCENARIO_LIABILITY_SHARES, SCENARIO_LOSS_PERCENTAGE
+)
+
+# Default on-disk result store. It is only written when a caller passes it
+# explicitly, holds one small JSON file per distinct manifest and is never
+# pruned, so clear it by deleting the directory.
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".results")
+
+# Results kept in memory per process, keyed like the on-disk store. Every
+# Streamlit session runs in its own thread and shares this cache.
+MEMORY_RESULTS_LIMIT = 256
+_memory_results = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def canonical_json(value):
+    """
+    Serialize to the canonical bytes every hash is taken over: sorted keys, no
+    whitespace and shortest round-trip floats, so equal inputs give equal bytes
+    on every machine
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def content_hash(value):
+    return hashlib.sha256(canonical_json(value)).hexdigest()
+
+def bank_snapshot(bank):
+    """
+    The bank balance sheet as recorded in a manifest, with its content hash
+    """
+    snapshot = {
+        "name": bank.name,
+        "total_assets": bank.total_assets,
+        "capacities": {c.name: bank.capacities[c.id] for c in CREDITORS}
+    }
+    return {**snapshot, "hash": content_hash(snapshot)}
+
+def build_manifest(bank, creditor_order, exempt_creditors, scenario, loss_percentage):
+    """
+    Describe one run of calculate_scenario_values and the loss allocation by
+    everything that determines its result. Creditors are recorded by name so
+    a manifest stays readable outside the app.
+    """
+    return {
+        "engine_version": ENGINE_VERSION,
+        "bank": bank_snapshot(bank),
+        "creditor_order": [CREDITORS[c].name for c in creditor_order],
+        "exempt_creditors": sorted(CREDITORS[c].name for c in exempt_creditors or ()),
+        "scenario": {
+            "name": scenario,
+            "loss_percentage": float(loss_percentage) if scenario == "Default" else SCENARIO_LOSS_PERCENTAGE,
+            "liability_share": SCENARIO_LIABILITY_SHARES.get(scenario, 0.0),
+            "asset_absorption_rate": ASSET_ABSORPTION_RATE
+        }
+    }
+
+def compute_manifest(manifest):
+    """
+    Recompute a manifest's result from the manifest alone
+    """
+    creditor_ids = {c.name: c.id for c in CREDITORS}
+    recorded = manifest["bank"]
+    bank = Bank(
+        name=recorded["name"],
+        total_assets=recorded["total_assets"],
+        capacities=tuple(recorded["capacities"][c.name] for c in CREDITORS)
+    )
+    creditor_order = [creditor_ids[c] for c in manifest["creditor_order"]]
+    exempt_creditors = {creditor_ids[c] for c in manifest["exempt_creditors"]}
+    scenario = manifest["scenario"]["name"]
+
+    total_loss, loss_absorbed, remaining_loss = calculate_scenario_losses(
+        bank.total_assets, manifest["scenario"]["loss_percentage"], scenario
+    )
+    asset_value, liability_value = calculate_scenario_values(bank.total_assets, scenario)
+    allocation = calculate_loss_allocation([remaining_loss], bank, creditor_order, exempt_creditors)
+
+    return {
+        "total_loss": float(total_loss),
+        "loss_absorbed": float(loss_absorbed),
+        "remaining_loss": float(remaining_loss),
+        "asset_value": float(asset_value),
+        "liability_value": float(liability_value),
+        "distribution": allocation["distribution"][0].tolist(),
+        "cumulative_loss": allocation["cumulative_loss"][0].tolist(),
+        "shortfall": float(allocation["shortfall"][0]),
+        "coverage_ratio": float(allocation["coverage_ratio"][0])
+    }
+
+def _result_path(key, results_dir):
+    return os.path.join(results_dir, key[:2], f"{key}.json")
+
+def _write_atomically(path, data):
+    # Concurrent workers may produce the same key; the last rename wins with
+    # identical bytes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _recall_result(key):
+    with _memory_lock:
+        data = _memory_results.get(key)
+        if data is not None:
+            _memory_results.move_to_end(key)
+        return data
+
+def _remember_result(key, data):
+    with _memory_lock:
+        _memory_results[key] = data
+        _memory_results.move_to_end(key)
+        while len(_memory_results) > MEMORY_RESULTS_LIMIT:
+            _memory_results.popitem(last=False)
+
+def _parse_result(data):
+    # None when stored bytes are damaged, e.g. truncated or hand-edited
+    try:
+        return json.loads(data)["result"]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def run_manifest(bank, creditor_order, exempt_creditors, scenario, loss_percentage, results_dir=None):
+    """
+    Compute a run, or read it back if an identical manifest was run before.
+    Results are cached in memory under the hash of their manifest and, when
+    results_dir is given, also stored there; if the directory cannot be
+    written the run falls back to the in-memory result, and a damaged stored
+    result is recomputed and replaced. Returns the manifest,
+    extended with its key, the hash of the result bytes and timings, and the
+    result itself.
+    """
+    start = time.perf_counter()
+    manifest = build_manifest(bank, creditor_order, exempt_creditors, scenario, loss_percentage)
+    key = content_hash(manifest)
+
+    path = None if results_dir is None else _result_path(key, results_dir)
+    data = _recall_result(key)
+    damaged = False
+    if data is None and path is not None:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            pass
+    result = None if data is None else _parse_result(data)
+    if data is not None and result is None:
+        data, damaged = None, True
+    cache_hit = data is not None
+    if data is None:
+        data = canonical_json({"manifest": manifest, "result": compute_manifest(manifest)})
+        result = _parse_result(data)
+
+    stored = False
+    if path is not None:
+        try:
+            if damaged or not os.path.exists(path):
+                _write_atomically(path, data)
+            stored = True
+        except OSError:
+            pass
+    _remember_result(key, data)
+
+    return {
+        **manifest,
+        "key": key,
+        "result_hash": hashlib.sha256(data).hexdigest(),
+        "timings": {
+            "seconds": time.perf_counter() - start,
+            "cache_hit": cache_hit
+        },
+        "stored": stored,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": sys.platform
+        }
+    }, result
+
+def verify_result(path):
+    """
+    Recompute a stored result from its manifest and check the bytes match
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        manifest = json.loads(data)["manifest"]
+    except (ValueError, KeyError, TypeError):
+        return False
+    return canonical_json({"manifest": manifest, "result": compute_manifest(manifest)}) == data
+
+def _run_job(job):
+    manifest, _ = run_manifest(*job)
+    return manifest["result_hash"]
+
+def run_sector_manifests(banks, creditor_order, exempt_creditors, scenario, loss_percentage,
+                         results_dir=None, workers=1):
+    """
+    Run every bank through run_manifest, optionally across worker processes,
+    and return {bank: result hash} plus one digest over all of them. The
+    digest only depends on the inputs, so it must match across machines and
+    worker counts.
+    """
+    jobs = [(bank, creditor_order, exempt_creditors, scenario, loss_percentage, results_dir)
+            for bank in banks.values()]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            hashes = list(executor.map(_run_job, jobs))
+    else:
+        hashes = [_run_job(job) for job in jobs]
+
+    result_hashes = dict(zip(banks, hashes))
+    return result_hashes, content_hash(result_hashes)
+
+if __name__ == "__main__":
+    # python manifest.py verify [results_dir] | python manifest.py digest [workers]
+    from data_models import BANKS, ASSET_ABSORPTION
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "digest"
+    if command == "verify":
+        results_dir = sys.argv[2] if len(sys.argv) > 2 else RESULTS_DIR
+        mismatches = 0
+        for root, _, files in os.walk(results_dir):
+            for name in files:
+                if name.endswith(".json") and not verify_result(os.path.join(root, name)):
+                    mismatches += 1
+                    print(f"MISMATCH {name}")
+        print(f"{mismatches} mismatching results")
+        sys.exit(1 if mismatches else 0)
+    else:
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        order = [c.id for c in CREDITORS if c.id != ASSET_ABSORPTION]
+        for scenario in SCENARIO_LIABILITY_SHARES:
+            _, digest = run_sector_manifests(
+                BANKS, order, set(), scenario, 10.0, results_dir=RESULTS_DIR, workers=workers
+            )
+            print(f"{scenario}: {digest}")
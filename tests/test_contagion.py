@@ -0,0 +1,42 @@
+import pytest
+
+from contagion import propagate_contagion
+from data_models import Bank, CREDITOR_IDS
+
+SENIOR = CREDITOR_IDS["Senior Unsecured Creditors"]
+SUBORDINATED = CREDITOR_IDS["Subordinated Debt"]
+SHAREHOLDERS = CREDITOR_IDS["Shareholders"]
+ORDER = [SHAREHOLDERS, SUBORDINATED, SENIOR]
+
+# Asset Absorption, SRF, Secured, Depositors, Senior, Subordinated, Shareholders
+CAPACITIES = (80.0, 0.0, 0.0, 0.0, 500.0, 100.0, 100.0)
+BANKS = {name: Bank(name, 1000.0, CAPACITIES) for name in ("Bank X", "Bank Y")}
+
+# Each bank holds half of the other's senior debt
+CYCLE = [
+    ("Bank X", "Bank Y", SENIOR, 250.0),
+    ("Bank Y", "Bank X", SENIOR, 250.0),
+]
+
+
+def test_two_bank_cycle_converges_to_fixed_point():
+    # A 30% loss is 300: 80 is absorbed by assets, 100 each by shareholders
+    # and subordinated debt, 20 by senior debt. With incoming loss I the
+    # senior loss is 20 + I, and I = 0.5 * (20 + I) gives I = 20.
+    result = propagate_contagion(BANKS, ORDER, CYCLE, "Default", 30, tolerance=1e-6, max_rounds=200)
+
+    assert result["converged"]
+    assert result["incoming_loss"] == pytest.approx([20.0, 20.0])
+    assert result["tier_losses"].ravel() == pytest.approx([100.0, 100.0, 40.0, 100.0, 100.0, 40.0])
+    assert result["shortfall"] == pytest.approx([0.0, 0.0])
+
+def test_exempt_tier_holds_exposures_but_passes_no_loss():
+    result = propagate_contagion(BANKS, ORDER, CYCLE, "Default", 30, exempt_creditors={SENIOR})
+
+    assert result["converged"]
+    assert result["incoming_loss"] == pytest.approx([0.0, 0.0])
+    assert result["shortfall"] == pytest.approx([20.0, 20.0])
+
+def test_exposure_outside_the_order_is_rejected():
+    with pytest.raises(ValueError, match="cannot hold interbank exposures"):
+        propagate_contagion(BANKS, [SHAREHOLDERS], CYCLE, "Default", 30)
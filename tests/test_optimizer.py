@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from data_models import Bank, CREDITOR_IDS, SINGLE_RESOLUTION_FUND
+from utils import calculate_loss_allocation, decode_exemption_mask, optimize_exemptions
+
+SENIOR = CREDITOR_IDS["Senior Unsecured Creditors"]
+SUBORDINATED = CREDITOR_IDS["Subordinated Debt"]
+SHAREHOLDERS = CREDITOR_IDS["Shareholders"]
+FUND = SINGLE_RESOLUTION_FUND
+
+
+def brute_force_feasible(remaining_loss, bank, creditor_order, min_bail_in_rate, max_fund_rate):
+    # Run the waterfall for every exemption set and apply the constraints to its losses
+    candidates = [c for c in creditor_order if c != FUND]
+    ahead = creditor_order[:creditor_order.index(FUND)] if FUND in creditor_order else creditor_order
+    feasible = []
+    for mask in range(1 << len(candidates)):
+        exempt = decode_exemption_mask(mask, candidates)
+        allocation = calculate_loss_allocation([remaining_loss], bank, creditor_order, exempt)
+        losses = dict(zip(creditor_order, allocation["distribution"][0]))
+        fund_loss = losses.get(FUND, 0.0)
+        bail_in = sum(losses[c] for c in ahead)
+        if (allocation["shortfall"][0] == 0
+                and (fund_loss <= 0 or bail_in >= min_bail_in_rate * bank.total_assets)
+                and fund_loss <= max_fund_rate * bank.total_assets):
+            feasible.append(mask)
+    return feasible
+
+@pytest.mark.parametrize("seed", range(50))
+def test_feasible_masks_match_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    capacities = (0.0, *rng.uniform(0.0, 200.0, size=6))
+    bank = Bank("Bank", 1000.0, capacities)
+    creditor_order = [int(c) for c in rng.permutation(np.arange(1, 7))]
+    if seed % 4 == 0:
+        creditor_order.remove(FUND)
+    remaining_loss = rng.uniform(0.0, sum(capacities[c] for c in creditor_order))
+    min_bail_in_rate = rng.uniform(0.0, 0.3)
+    max_fund_rate = rng.uniform(0.0, 0.1)
+
+    result = optimize_exemptions(
+        remaining_loss, bank, creditor_order,
+        min_bail_in_rate=min_bail_in_rate, max_fund_rate=max_fund_rate
+    )
+
+    expected = brute_force_feasible(remaining_loss, bank, creditor_order, min_bail_in_rate, max_fund_rate)
+    assert result["feasible_masks"].tolist() == expected
+
+def test_optimal_set_prefers_smaller_fund_loss_on_ties():
+    # Exempting nothing is feasible, and so is exempting any one of the three
+    # tiers, which exempts 50. Exempting shareholders or subordinated debt
+    # pushes 30 onto the fund; exempting senior debt, which ranks after the
+    # fund, does not. Any two exemptions leave a shortfall.
+    capacities = [0.0] * 7
+    capacities[FUND] = 30.0
+    for tier in (SHAREHOLDERS, SUBORDINATED, SENIOR):
+        capacities[tier] = 50.0
+    bank = Bank("Bank", 1000.0, tuple(capacities))
+
+    result = optimize_exemptions(
+        100.0, bank, [SHAREHOLDERS, SUBORDINATED, FUND, SENIOR],
+        min_bail_in_rate=0.04, max_fund_rate=0.1
+    )
+
+    assert result["exempt_amount"].tolist() == [0.0, 50.0, 50.0, 50.0]
+    assert result["fund_loss"].tolist() == [0.0, 30.0, 30.0, 0.0]
+    assert result["optimal"] == frozenset({SENIOR})
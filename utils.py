@@ -1,41 +1,90 @@
-def calculate_loss_distribution(total_loss, bank_data, creditors, creditor_order, exempt_creditors=None):
+from functools import lru_cache
+
+import numpy as np
+
+from data_models import ASSET_ABSORPTION, SINGLE_RESOLUTION_FUND
+
+# Recorded in run manifests; bump whenever a calculation's output can change
+ENGINE_VERSION = "1.1"
+
+# Share of total assets moved to liabilities under each valuation scenario
+SCENARIO_LIABILITY_SHARES = {
+    "Default": 0.0,
+    "FOLTF": 0.20,
+    "Resolution Valuation": 0.30,
+    "Liquidation Valuation": 0.40
+}
+
+# Loss percentage used by every scenario other than "Default"
+SCENARIO_LOSS_PERCENTAGE = 20.0
+
+# Share of scenario assets absorbing losses before any creditor is hit
+ASSET_ABSORPTION_RATE = 0.08
+
+# Unallocated losses below this many euros are floating-point residue
+ALLOCATION_TOLERANCE = 1.0
+
+
+def calculate_loss_distribution_batch(total_losses, bank, creditor_order, exempt_creditors=None):
     """
-    Calculate loss distribution based on creditor hierarchy, considering asset absorption and exemptions
+    Distribute many total losses at once down the creditor hierarchy, taking
+    asset absorption first and skipping exempt creditors. Losses beyond the
+    non-exempt capacity stay unallocated; summarize_loss_allocation reports
+    them as the shortfall.
+    Returns an array of shape (len(total_losses), len(creditor_order)) whose
+    columns follow creditor_order.
     """
     if exempt_creditors is None:
         exempt_creditors = set()
 
-    remaining_loss = total_loss
-    distribution = {creditor: 0 for creditor in creditor_order}
+    remaining_loss = np.atleast_1d(np.asarray(total_losses, dtype=float)).copy()
+    distribution = np.zeros((remaining_loss.size, len(creditor_order)))
 
     # First handle Asset Absorption
-    if "Asset Absorption" in creditor_order:
-        absorption_capacity = bank_data["Asset Absorption"]
-        loss_absorbed = min(remaining_loss, absorption_capacity)
-        distribution["Asset Absorption"] = loss_absorbed
+    if ASSET_ABSORPTION in creditor_order:
+        loss_absorbed = np.minimum(remaining_loss, bank.capacities[ASSET_ABSORPTION])
+        distribution[:, creditor_order.index(ASSET_ABSORPTION)] = loss_absorbed
         remaining_loss -= loss_absorbed
 
-        if remaining_loss <= 0:
-            return distribution
-
-    # Then distribute remaining losses among non-exempt creditors
-    available_creditors = [c for c in creditor_order 
-                         if c not in exempt_creditors and c != "Asset Absorption"]
+    # Each tier takes whatever is left once the tiers above it are exhausted
+    columns = [i for i, c in enumerate(creditor_order)
+               if c not in exempt_creditors and c != ASSET_ABSORPTION]
+    if columns:
+        capacities = np.array(bank.capacities)[[creditor_order[i] for i in columns]]
+        absorbed_before = np.concatenate(([0.0], np.cumsum(capacities)[:-1]))
+        distribution[:, columns] = np.clip(
+            remaining_loss[:, None] - absorbed_before[None, :], 0.0, capacities[None, :]
+        )
 
-    for creditor in available_creditors:
-        # Get maximum absorption capacity for this creditor
-        capacity = bank_data[creditor] if creditor in bank_data else 0
-
-        # Calculate loss to be absorbed by this creditor
-        loss_absorbed = min(remaining_loss, capacity)
-        distribution[creditor] = loss_absorbed
+    return distribution
 
-        # Update remaining loss
-        remaining_loss -= loss_absorbed
-        if remaining_loss <= 0:
-            break
+def summarize_loss_allocation(total_losses, distribution):
+    """
+    Account for a batched distribution: the loss each tier has absorbed
+    cumulatively down the hierarchy, the shortfall left unallocated once every
+    non-exempt tier is exhausted, and the share of the loss covered.
+    Shortfalls below ALLOCATION_TOLERANCE are reported as zero.
+    Every array keeps the batched layout, one row per total loss.
+    """
+    total_losses = np.atleast_1d(np.asarray(total_losses, dtype=float))
+    cumulative_loss = np.cumsum(distribution, axis=1)
+    allocated = cumulative_loss[:, -1] if distribution.shape[1] else np.zeros(len(total_losses))
+    shortfall = total_losses - allocated
+    return {
+        "distribution": distribution,
+        "cumulative_loss": cumulative_loss,
+        "shortfall": np.where(shortfall < ALLOCATION_TOLERANCE, 0.0, shortfall),
+        "coverage_ratio": np.divide(
+            allocated, total_losses, out=np.ones_like(total_losses), where=total_losses > 0
+        )
+    }
 
-    return distribution
+def calculate_loss_allocation(total_losses, bank, creditor_order, exempt_creditors=None):
+    """
+    calculate_loss_distribution_batch plus its shortfall accounting
+    """
+    distribution = calculate_loss_distribution_batch(total_losses, bank, creditor_order, exempt_creditors)
+    return summarize_loss_allocation(total_losses, distribution)
 
 def reorder_creditors(current_order, creditor_to_move, new_position):
     """
@@ -45,14 +94,14 @@ def reorder_creditors(current_order, creditor_to_move, new_position):
     order = current_order.copy()
 
     # Don't allow moving Asset Absorption
-    if creditor_to_move == "Asset Absorption":
+    if creditor_to_move == ASSET_ABSORPTION:
         return order
 
     current_position = order.index(creditor_to_move)
     order.pop(current_position)
 
     # Ensure we don't insert before Asset Absorption
-    if "Asset Absorption" in order and new_position == 0:
+    if ASSET_ABSORPTION in order and new_position == 0:
         new_position = 1
 
     order.insert(new_position, creditor_to_move)
@@ -62,4 +111,228 @@ def calculate_total_loss_with_absorption(total_assets, loss_percentage):
     """
     Calculate total loss considering the 8% asset absorption threshold
     """
-    return total_assets * (loss_percentage / 100)
\ No newline at end of file
+    return total_assets * (loss_percentage / 100)
+
+def calculate_scenario_values(total_assets, scenario):
+    """
+    Calculate asset and liability values based on selected scenario
+    """
+    liability_value = total_assets * SCENARIO_LIABILITY_SHARES.get(scenario, 0.0)
+    asset_value = total_assets - liability_value
+    return asset_value, liability_value
+
+def calculate_scenario_losses(total_assets, loss_percentage, scenario):
+    """
+    Split the scenario loss into the part absorbed by assets and the part
+    left for the creditor hierarchy
+    """
+    if scenario != "Default":
+        loss_percentage = SCENARIO_LOSS_PERCENTAGE
+    total_loss = calculate_total_loss_with_absorption(total_assets, loss_percentage)
+    asset_value, _ = calculate_scenario_values(total_assets, scenario)
+    loss_absorbed = min(total_loss, asset_value * ASSET_ABSORPTION_RATE)
+    remaining_loss = max(0, total_loss - loss_absorbed)
+    return total_loss, loss_absorbed, remaining_loss
+
+@lru_cache(maxsize=32)
+def _hierarchy_results(banks, creditor_order, exempt_creditors, scenarios, loss_percentage):
+    results = {}
+    for name, bank in banks:
+        remaining_losses = [
+            calculate_scenario_losses(bank.total_assets, loss_percentage, scenario)[2]
+            for scenario in scenarios
+        ]
+        distribution = calculate_loss_distribution_batch(
+            remaining_losses, bank, list(creditor_order), exempt_creditors
+        )
+        distribution.setflags(write=False)
+        results[name] = distribution
+    return results
+
+def calculate_hierarchy_results(banks, creditor_order, exempt_creditors, scenarios, loss_percentage):
+    """
+    Loss per creditor for every bank and scenario under one hierarchy.
+    Returns {bank: array of shape (len(scenarios), len(creditor_order))}.
+    Results are cached, so repeated calls with the same inputs are free.
+    """
+    return _hierarchy_results(
+        tuple(banks.items()),
+        tuple(creditor_order),
+        frozenset(exempt_creditors or ()),
+        tuple(scenarios),
+        float(loss_percentage)
+    )
+
+def compare_hierarchies(banks, baseline, alternatives, scenarios, loss_percentage):
+    """
+    Compare alternative hierarchies against a pinned baseline.
+    baseline and each alternative are (creditor_order, exempt_creditors) pairs.
+    Returns one {bank: array of shape (len(scenarios), len(baseline order))}
+    of loss deltas (alternative minus baseline) per alternative, with columns
+    following the baseline creditor order.
+    """
+    baseline_order, baseline_exempt = baseline
+    baseline_results = calculate_hierarchy_results(
+        banks, baseline_order, baseline_exempt, scenarios, loss_percentage
+    )
+
+    deltas = []
+    for creditor_order, exempt_creditors in alternatives:
+        results = calculate_hierarchy_results(
+            banks, creditor_order, exempt_creditors, scenarios, loss_percentage
+        )
+        # Re-align columns onto the baseline order; creditors missing from an
+        # alternative simply absorb nothing
+        columns = [creditor_order.index(c) if c in creditor_order else None for c in baseline_order]
+        alternative_deltas = {}
+        for bank, baseline_distribution in baseline_results.items():
+            aligned = np.zeros_like(baseline_distribution)
+            for i, column in enumerate(columns):
+                if column is not None:
+                    aligned[:, i] = results[bank][:, column]
+            alternative_deltas[bank] = aligned - baseline_distribution
+        deltas.append(alternative_deltas)
+    return deltas
+
+def loss_percentage_grid(start, stop, step):
+    """
+    Loss percentages from start to stop inclusive in steps of step, ending on
+    stop even when the range is not a whole number of steps
+    """
+    count = int(np.floor((stop - start) / step + 1e-9)) + 1
+    grid = np.round(start + step * np.arange(count), 6)
+    if grid[-1] < stop:
+        grid = np.append(grid, stop)
+    return grid
+
+@lru_cache(maxsize=64)
+def _loss_surface(bank, creditor_order, creditor, exempt_creditors, scenario, start, stop, step):
+    loss_percentages = loss_percentage_grid(start, stop, step)
+    total_losses = bank.total_assets * loss_percentages / 100
+    asset_value, _ = calculate_scenario_values(bank.total_assets, scenario)
+    remaining_loss = np.maximum(total_losses - asset_value * ASSET_ABSORPTION_RATE, 0.0)
+    if ASSET_ABSORPTION in creditor_order:
+        remaining_loss -= np.minimum(remaining_loss, bank.capacities[ASSET_ABSORPTION])
+
+    # Row p puts the creditor behind the first p others, so it only takes what
+    # is left once their capacity is used up
+    others = [c for c in creditor_order if c not in (creditor, ASSET_ABSORPTION)]
+    capacity_ahead = np.concatenate(([0.0], np.cumsum(
+        [0.0 if c in exempt_creditors else bank.capacities[c] for c in others]
+    )))
+    capacity = 0.0 if creditor in exempt_creditors else bank.capacities[creditor]
+    surface = np.clip(remaining_loss[None, :] - capacity_ahead[:, None], 0.0, capacity)
+
+    loss_percentages.setflags(write=False)
+    surface.setflags(write=False)
+    return loss_percentages, surface
+
+def calculate_loss_surface(bank, creditor_order, creditor, scenario, start=0.0, stop=100.0, step=0.1,
+                           exempt_creditors=None):
+    """
+    Loss of one creditor for every loss percentage in [start, stop] against
+    every position it could take in the hierarchy; row p has p of the other
+    creditors ranked ahead of it. The scenario only sets the asset value
+    absorbing the first 8%. Each window and step is cached, so zooming back
+    out or revisiting a grid is free.
+    Returns (loss_percentages, surface of shape (positions, len(loss_percentages))).
+    """
+    return _loss_surface(
+        bank,
+        tuple(creditor_order),
+        creditor,
+        frozenset(exempt_creditors or ()),
+        scenario,
+        float(start),
+        float(stop),
+        float(step)
+    )
+
+def _subset_sums(values):
+    # sums[mask] is the total of values whose bits are set in mask, built one
+    # bit at a time from the partial sums of the lower bits. Not cached: the
+    # table is rebuilt in linear time and differs for every bank.
+    sums = np.zeros(1 << len(values))
+    for i, value in enumerate(values):
+        sums[1 << i:2 << i] = sums[:1 << i] + value
+    return sums
+
+def decode_exemption_mask(mask, candidates):
+    """
+    Turn an exemption bitmask back into the set of exempt creditors
+    """
+    return frozenset(c for i, c in enumerate(candidates) if mask >> i & 1)
+
+def optimize_exemptions(remaining_loss, bank, creditor_order, prior_bail_in=0.0,
+                        min_bail_in_rate=0.08, max_fund_rate=0.05, candidates=None,
+                        fund=SINGLE_RESOLUTION_FUND):
+    """
+    Search every exemption subset of the candidate creditors as a bitmask and
+    keep those that allocate the whole loss, bail in at least min_bail_in_rate
+    of total assets before the fund is used, and keep the fund's loss within
+    max_fund_rate of total assets.
+    Bail-in is the creditor loss ranked ahead of the fund plus prior_bail_in,
+    for creditor losses taken outside remaining_loss. The loss absorbed by
+    assets is not bail-in and must not be passed as prior_bail_in.
+    The optimal set exempts the largest amount of liabilities, preferring the
+    smaller fund loss on ties. Returns a dict with the candidates, the
+    feasible masks with their fund loss and bail-in, and the optimal set
+    (None when nothing is feasible).
+    """
+    order = [c for c in creditor_order if c != ASSET_ABSORPTION]
+    if candidates is None:
+        candidates = [c for c in order if c != fund]
+    candidates = [c for c in candidates if c in order]
+
+    capacities = bank.capacities
+    exempt_sums = _subset_sums(tuple(capacities[c] for c in candidates))
+    masks = np.arange(len(exempt_sums))
+    bits = {c: 1 << i for i, c in enumerate(candidates)}
+
+    total_capacity = sum(capacities[c] for c in order)
+    allocated = np.minimum(remaining_loss, total_capacity - exempt_sums)
+    unallocated = remaining_loss - allocated
+
+    if fund in order:
+        ahead = order[:order.index(fund)]
+        ahead_bits = sum(bits.get(c, 0) for c in ahead)
+        capacity_ahead = sum(capacities[c] for c in ahead) - exempt_sums[masks & ahead_bits]
+        fund_capacity = np.where(masks & bits.get(fund, 0), 0.0, capacities[fund])
+        fund_loss = np.clip(remaining_loss - capacity_ahead, 0.0, fund_capacity)
+        bail_in = prior_bail_in + np.minimum(remaining_loss, capacity_ahead)
+    else:
+        fund_loss = np.zeros(len(masks))
+        bail_in = prior_bail_in + allocated
+
+    total_assets = bank.total_assets
+    feasible = (
+        (unallocated < ALLOCATION_TOLERANCE)
+        & ((fund_loss <= 0) | (bail_in >= min_bail_in_rate * total_assets))
+        & (fund_loss <= max_fund_rate * total_assets)
+    )
+
+    feasible_masks = masks[feasible]
+    optimal = None
+    if feasible_masks.size:
+        best = np.lexsort((fund_loss[feasible], -exempt_sums[feasible]))[0]
+        optimal = decode_exemption_mask(int(feasible_masks[best]), candidates)
+
+    return {
+        "candidates": candidates,
+        "feasible_masks": feasible_masks,
+        "fund_loss": fund_loss[feasible],
+        "bail_in": bail_in[feasible],
+        "exempt_amount": exempt_sums[feasible],
+        "optimal": optimal
+    }
+
+def optimize_sector_exemptions(banks, creditor_order, scenario, loss_percentage, **constraints):
+    """
+    Run optimize_exemptions for every bank on the loss left after asset
+    absorption under one scenario. Returns {bank: result}.
+    """
+    results = {}
+    for name, bank in banks.items():
+        _, _, remaining_loss = calculate_scenario_losses(bank.total_assets, loss_percentage, scenario)
+        results[name] = optimize_exemptions(remaining_loss, bank, creditor_order, **constraints)
+    return results